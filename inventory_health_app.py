@@ -3,10 +3,12 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
+from io import BytesIO
+from typing import Optional, Tuple
+import plotly.graph_objects as go
 from inventory_utils import (
-    get_row_fill_color, generate_excel, assess_status, suggest_reorder,
-    highlight_row, simulate_runout, highlight_forecast
+    generate_excel, assess_status_vec, suggest_reorder_vec,
+    style_table, runout_and_coverage, highlight_forecast
 )
 
 st.set_page_config(page_title="Inventory Health Check", layout="wide")
@@ -17,6 +19,124 @@ FORECAST_SUFFIX = "-25"  # Change this if your forecast columns use a different
 
 st.info(f"Forecast simulation uses columns ending with '{FORECAST_SUFFIX}'. Adjust your file or the app setting if needed.")
 
+REQUIRED_COLS = [
+    "SKU Code", "SKU Description", "SKU Category", "Site", "Source",
+    "SOH", "Safety Stock", "Min Qty", "Max Qty",
+    "MOQ", "Max Order Qty", "Minor Order Multiple", "Major Order Multiple"
+]
+
+STRING_COLS = ["SKU Code", "SKU Description", "SKU Category", "Site", "Source"]
+NUMERIC_COLS = ["SOH", "Safety Stock", "Min Qty", "Max Qty", "MOQ", "Max Order Qty", "Minor Order Multiple", "Major Order Multiple"]
+FILTER_COLS = ["Site", "SKU Category", "Source"]
+
+# Parse-time dtypes so identifiers like "001" keep their leading zeros
+DTYPES = {col: "string" for col in STRING_COLS}
+# The PO side of the SKU Code join must be parsed the same way
+PO_DTYPES = {"SKU Code": "string"}
+
+INT32_INFO = np.iinfo(np.int32)
+
+# ---- Cached loaders (keyed on the uploaded bytes, so widget reruns skip parsing)
+@st.cache_data(show_spinner=False)
+def load_inventory(file_bytes: bytes, name: str) -> Optional[pd.DataFrame]:
+    """
+    Parse and normalize the inventory file, then add Status and Suggested Reorder Qty.
+    Returns None if any required column is missing.
+    """
+    if name.endswith('.csv'):
+        df = pd.read_csv(BytesIO(file_bytes), dtype=DTYPES)
+    else:
+        df = pd.read_excel(BytesIO(file_bytes), dtype=DTYPES)
+
+    # 🟢 Fix column name spacing
+    df.columns = df.columns.str.strip()
+
+    if not all(col in df.columns for col in REQUIRED_COLS):
+        return None
+
+    for col in NUMERIC_COLS:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        # Whole-number quantities that fit in int32 are stored compactly as nullable Int32;
+        # anything fractional or out of range stays float64 so no value changes
+        values = df[col].dropna()
+        if ((values % 1 == 0) & values.between(INT32_INFO.min, INT32_INFO.max)).all():
+            df[col] = df[col].astype("Int32")
+    df[STRING_COLS] = df[STRING_COLS].astype("string").fillna("").apply(lambda s: s.str.strip())
+    # Filter columns are dictionary-encoded so isin compares integer codes
+    for col in FILTER_COLS:
+        df[col] = df[col].astype("category")
+
+    # ---- Business Logic
+    df["Status"] = assess_status_vec(df)
+    df["Suggested Reorder Qty"] = suggest_reorder_vec(df)
+    return df
+
+@st.cache_data(show_spinner=False)
+def load_po(file_bytes: bytes, name: str) -> pd.DataFrame:
+    """
+    Parse and clean the Purchase Order Report, keeping SKU Code, Order Qty and Expected Delivery Date.
+    """
+    if name.endswith('.csv'):
+        df_po = pd.read_csv(BytesIO(file_bytes), dtype=PO_DTYPES)
+    else:
+        df_po = pd.read_excel(BytesIO(file_bytes), dtype=PO_DTYPES)
+    # Clean up PO columns
+    df_po.columns = df_po.columns.str.strip()  # Remove leading/trailing spaces from column names
+    df_po['SKU Code'] = df_po['SKU Code'].astype("string").str.strip()
+    # Parse Expected Delivery Date with explicit format, fallback to generic if needed
+    try:
+        df_po['Expected Delivery Date'] = pd.to_datetime(df_po['Expected Delivery Date'], format='%d/%m/%Y', errors='coerce')
+    except Exception:
+        df_po['Expected Delivery Date'] = pd.to_datetime(df_po['Expected Delivery Date'], errors='coerce')
+    df_po['Order Qty'] = pd.to_numeric(df_po['Order Qty'], errors='coerce')
+    # Drop rows with missing key info
+    df_po = df_po.dropna(subset=['SKU Code', 'Expected Delivery Date'])
+    # Only keep relevant columns
+    return df_po[['SKU Code', 'Order Qty', 'Expected Delivery Date']]
+
+# ---- Pie chart colors
+STATUS_COLORS = {
+    "🔴 Critical!!! Below Min Qty": "#D44444",
+    "🟠 Reorder Level": "#FF9148",
+    "🕣 Overstocked": "#7B4FB6",
+    "✅ Healthy": "#8CDF8C",
+    "❓ Missing SOH": "#B0B0B0"  # Changed to gray for clarity
+}
+
+@st.cache_data(show_spinner=False)
+def status_pie(labels: Tuple[str, ...], values: Tuple[int, ...]) -> go.Figure:
+    """
+    Build the status pie chart from precomputed status counts.
+    """
+    fig = go.Figure(go.Pie(
+        labels=list(labels),
+        values=list(values),
+        marker=dict(colors=[STATUS_COLORS.get(s, "#FFFFFF") for s in labels])
+    ))
+    fig.update_layout(title="Status Summary")
+    return fig
+
+# ---- Cached download payloads (serialized once per distinct table, not on every rerun)
+# Keyed on the filtered table, so cap the entries to keep memory bounded across filter changes
+DOWNLOAD_CACHE_ENTRIES = 8
+
+@st.cache_data(show_spinner=False, max_entries=DOWNLOAD_CACHE_ENTRIES)
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Serialize a DataFrame to CSV bytes for download.
+    """
+    buf = BytesIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+@st.cache_data(show_spinner=False, max_entries=DOWNLOAD_CACHE_ENTRIES)
+def to_excel_bytes(df: pd.DataFrame) -> bytes:
+    """
+    Serialize a DataFrame to the color-coded Excel workbook for download.
+    """
+    return generate_excel(df).getvalue()
+
 # ---- File Upload
 uploaded_file = st.file_uploader("Upload your inventory file", type=["csv", "xlsx"])
 
@@ -28,45 +148,36 @@ if uploaded_file:
     st.success(f"Inventory file uploaded: {uploaded_file.name}")
     if uploaded_po_file:
         st.info(f"Purchase Order Report uploaded: {uploaded_po_file.name}")
-    if uploaded_file.name.endswith('.csv'):
-        df = pd.read_csv(uploaded_file)
-    else:
-        df = pd.read_excel(uploaded_file)
-
-    # 🟢 Fix column name spacing
-    df.columns = df.columns.str.strip()
+    # Status and Suggested Reorder Qty are computed on the full frame inside the cache,
+    # so each filter change below is just a boolean-mask slice
+    df_full = load_inventory(uploaded_file.getvalue(), uploaded_file.name)
 
-    required_cols = [
-        "SKU Code", "SKU Description", "SKU Category", "Site", "Source",
-        "SOH", "Safety Stock", "Min Qty", "Max Qty",
-        "MOQ", "Max Order Qty", "Minor Order Multiple", "Major Order Multiple"
-    ]
-
-    string_cols = ["SKU Code", "SKU Description", "SKU Category", "Site", "Source"]
-    numeric_cols = ["SOH", "Safety Stock", "Min Qty", "Max Qty", "MOQ", "Max Order Qty", "Minor Order Multiple", "Major Order Multiple"]
-
-    if not all(col in df.columns for col in required_cols):
+    if df_full is None:
         st.error("❌ Missing one or more required columns.")
         st.stop()
 
-    for col in string_cols:
-        df[col] = df[col].astype(str).fillna("").str.strip()
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-
     # ---- Filters
     st.sidebar.header("🔍 Filter Options")
-    selected_site = st.sidebar.multiselect("Site", df['Site'].unique(), default=df['Site'].unique())
-    selected_cat = st.sidebar.multiselect("SKU Category", df['SKU Category'].unique(), default=df['SKU Category'].unique())
-    selected_source = st.sidebar.multiselect("Source", df['Source'].unique(), default=df['Source'].unique())
+    site_options = df_full['Site'].cat.categories
+    cat_options = df_full['SKU Category'].cat.categories
+    source_options = df_full['Source'].cat.categories
+    selected_site = st.sidebar.multiselect("Site", site_options, default=site_options)
+    selected_cat = st.sidebar.multiselect("SKU Category", cat_options, default=cat_options)
+    selected_source = st.sidebar.multiselect("Source", source_options, default=source_options)
 
-    df = df[(df['Site'].isin(selected_site)) &
-            (df['SKU Category'].isin(selected_cat)) &
-            (df['Source'].isin(selected_source))]
+    # Match on category codes directly rather than hashing the labels
+    mask = np.ones(len(df_full), dtype=bool)
+    for col, selected in [('Site', selected_site), ('SKU Category', selected_cat), ('Source', selected_source)]:
+        categories = df_full[col].cat.categories
+        selected_codes = np.array([categories.get_loc(v) for v in selected], dtype=np.int32)
+        mask &= np.isin(df_full[col].cat.codes.to_numpy(), selected_codes)
+    df = df_full.iloc[mask]
 
-    # ---- Business Logic
-    df["Status"] = df.apply(assess_status, axis=1)
-    df["Suggested Reorder Qty"] = df.apply(suggest_reorder, axis=1)
+    # Forecast usage block, shared by the runout estimate and the coverage simulation
+    forecast_cols = [col for col in df.columns if col.endswith(FORECAST_SUFFIX)]
+    fc_arr = df[forecast_cols].to_numpy(dtype=np.float32, na_value=np.nan)
+    soh_arr = df['SOH'].to_numpy(dtype=np.float64, na_value=np.nan)
+    runout_period, coverage_marks = runout_and_coverage(fc_arr, soh_arr)
 
     # Base display columns without PO info
     display_cols = ["SKU Code", "SKU Description", "SKU Category", "Site", "Source", "SOH", "Status", "Suggested Reorder Qty"]
@@ -74,77 +185,34 @@ if uploaded_file:
     # ---- Purchase Order Integration ----
     po_info = None
     if uploaded_po_file:
-        if uploaded_po_file.name.endswith('.csv'):
-            df_po = pd.read_csv(uploaded_po_file)
-        else:
-            df_po = pd.read_excel(uploaded_po_file)
-        # Clean up PO columns
-        df_po.columns = df_po.columns.str.strip()  # Remove leading/trailing spaces from column names
-        df_po['SKU Code'] = df_po['SKU Code'].astype(str).str.strip()
-        # Parse Expected Delivery Date with explicit format, fallback to generic if needed
-        try:
-            df_po['Expected Delivery Date'] = pd.to_datetime(df_po['Expected Delivery Date'], format='%d/%m/%Y', errors='coerce')
-        except Exception:
-            df_po['Expected Delivery Date'] = pd.to_datetime(df_po['Expected Delivery Date'], errors='coerce')
-        df_po['Order Qty'] = pd.to_numeric(df_po['Order Qty'], errors='coerce')
-        # Drop rows with missing key info
-        df_po = df_po.dropna(subset=['SKU Code', 'Expected Delivery Date'])
-        # Only keep relevant columns
-        df_po = df_po[['SKU Code', 'Order Qty', 'Expected Delivery Date']]
-        # For each SKU, find the earliest PO arrival
-        po_next_arrival = df_po.groupby('SKU Code')['Expected Delivery Date'].min().to_dict()
-        po_next_qty = df_po.groupby('SKU Code')['Order Qty'].sum().to_dict()
+        df_po = load_po(uploaded_po_file.getvalue(), uploaded_po_file.name)
+        # For each SKU, find the earliest PO arrival and total quantity on order
+        po_agg = df_po.groupby('SKU Code', as_index=False).agg(**{
+            'Next PO Arrival': ('Expected Delivery Date', 'min'),
+            'Next PO Qty': ('Order Qty', 'sum'),
+        })
         # Estimate runout date using forecast columns if available
-        forecast_cols = [col for col in df.columns if col.endswith(FORECAST_SUFFIX)]
-        def estimate_runout(row):
-            if not forecast_cols or row['SOH'] <= 0:
-                return np.nan
-            remaining = row['SOH']
-            for i, col in enumerate(forecast_cols):
-                usage = row.get(col, 0)
-                if pd.isna(usage):
-                    continue
-                remaining -= usage
-                if remaining <= 0:
-                    # Assume each forecast col is 1 period (e.g., week)
-                    return float(i)  # periods until runout as float
-            return np.nan
-        df['Runout Period'] = df.apply(estimate_runout, axis=1)
+        # Assume each forecast col is 1 period (e.g., week)
+        df['Runout Period'] = runout_period
         # Map PO info to inventory
-        def get_next_po(row):
-            return po_next_arrival.get(row['SKU Code'], None)
-        def get_next_po_qty(row):
-            return po_next_qty.get(row['SKU Code'], None)
-        df['Next PO Arrival'] = df.apply(get_next_po, axis=1)
-        df['Next PO Qty'] = df.apply(get_next_po_qty, axis=1)
+        df = df.join(po_agg.set_index('SKU Code'), on='SKU Code')
         # Determine if PO mitigates OOS
-        def mitigates_oos(row):
-            if pd.isna(row['Runout Period']) or pd.isna(row['Next PO Arrival']):
-                return 'N/A'
-            # Assume forecast period is 1 week, and first forecast col is next week
-            from datetime import datetime, timedelta
-            today = pd.Timestamp.today().normalize()
-            runout_date = today + pd.Timedelta(weeks=float(row['Runout Period']))
-            if row['Next PO Arrival'] <= runout_date:
-                return 'Yes'
-            else:
-                return 'No'
-        df['PO Mitigates OOS?'] = df.apply(mitigates_oos, axis=1)
+        # Assume forecast period is 1 week, and first forecast col is next week
+        today = pd.Timestamp.today().normalize()
+        runout_date = today + pd.to_timedelta(df['Runout Period'] * 7, unit='D')
+        valid = df['Runout Period'].notna() & df['Next PO Arrival'].notna()
+        df['PO Mitigates OOS?'] = np.where(
+            ~valid, 'N/A', np.where(df['Next PO Arrival'] <= runout_date, 'Yes', 'No')
+        )
         
         # Add PO columns to display only if PO file is uploaded
         display_cols.extend(['Next PO Arrival', 'PO Mitigates OOS?'])
 
     # ---- Pie Chart
-    status_colors = {
-        "🔴 Critical!!! Below Min Qty": "#D44444",
-        "🟠 Reorder Level": "#FF9148",
-        "🕣 Overstocked": "#7B4FB6",
-        "✅ Healthy": "#8CDF8C",
-        "❓ Missing SOH": "#B0B0B0"  # Changed to gray for clarity
-    }
-
     st.subheader("📊 Inventory Status Distribution")
-    fig = px.pie(df, names="Status", title="Status Summary", color="Status", color_discrete_map=status_colors)
+    counts = df['Status'].value_counts()
+    counts = counts[counts > 0]  # Categorical value_counts also lists unused statuses
+    fig = status_pie(tuple(counts.index), tuple(int(v) for v in counts.values))
     st.plotly_chart(fig, use_container_width=True)
 
     # ---- Table Styling
@@ -153,16 +221,15 @@ if uploaded_file:
     st.subheader("📦 Inventory Table with Color Coding")
     table_height = min(600, 40 + 30 * len(df_display))  # Dynamic height
     st.dataframe(
-        df_display.style.apply(highlight_row, axis=1),
+        style_table(df_display),
         use_container_width=True,
         height=table_height
     )
 
     # ---- Forecast Coverage Simulation ----
-    forecast_cols = [col for col in df.columns if col.endswith(FORECAST_SUFFIX)]
     if forecast_cols:
         df_coverage = df[["SKU Code", "SOH"] + forecast_cols].copy()
-        df_coverage[forecast_cols] = df_coverage.apply(lambda row: simulate_runout(row, forecast_cols), axis=1)
+        df_coverage[forecast_cols] = coverage_marks
         st.subheader("📆 Forecast Coverage Simulation")
         st.dataframe(
             df_coverage.style.applymap(highlight_forecast, subset=forecast_cols),
@@ -176,15 +243,14 @@ if uploaded_file:
     with col1:
         st.download_button(
             label="📅 Download as CSV",
-            data=df_display.to_csv(index=False),
+            data=to_csv_bytes(df_display),
             file_name="inventory_status.csv",
             mime="text/csv"
         )
     with col2:
-        excel_file = generate_excel(df_display)
         st.download_button(
             label="📊 Download as Excel",
-            data=excel_file,
+            data=to_excel_bytes(df_display),
             file_name="inventory_status_colored.xlsx",
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         )
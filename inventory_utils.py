@@ -1,21 +1,32 @@
 import pandas as pd
 import numpy as np
-import openpyxl
 from openpyxl.styles import PatternFill, Font
+from openpyxl.utils import get_column_letter
 from io import BytesIO
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Tuple
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional; NumPy fallbacks are used without it
+    njit = None
+
+# Status -> row fill color used by both the table styler and the Excel export
+FILL_COLORS: Dict[str, str] = {
+    "🔴 Critical!!! Below Min Qty": "#FFCCCC",
+    "🟠 Reorder Level": "#FFE4B3",
+    "🕣 Overstocked": "#FFCCFF",
+    "✅ Healthy": "#CCFFCC",
+    "❓ Missing SOH": "#E0E0E0"
+}
+
+# Number format for datetime cells in the Excel export; column widths are sized to it
+EXCEL_DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
 
 def get_row_fill_color(status: str) -> str:
     """
     Map inventory status to a hex color code for row highlighting.
     """
-    return {
-        "🔴 Critical!!! Below Min Qty": "#FFCCCC",
-        "🟠 Reorder Level": "#FFE4B3",
-        "🕣 Overstocked": "#FFCCFF",
-        "✅ Healthy": "#CCFFCC",
-        "❓ Missing SOH": "#E0E0E0"
-    }.get(status, "#FFFFFF")
+    return FILL_COLORS.get(status, "#FFFFFF")
 
 def generate_excel(df_to_export: pd.DataFrame) -> BytesIO:
     """
@@ -23,107 +34,163 @@ def generate_excel(df_to_export: pd.DataFrame) -> BytesIO:
     Freezes the header row and auto-adjusts column widths.
     """
     output = BytesIO()
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Inventory Status"
-    headers = df_to_export.columns.tolist()
-    ws.append(headers)
-    for _, row in df_to_export.iterrows():
-        row_values = row.tolist()
-        ws.append(row_values)
-        status = row.get("Status", "")
-        fill_color = get_row_fill_color(status)
-        if fill_color:
-            for col in range(1, len(row_values) + 1):
-                cell = ws.cell(row=ws.max_row, column=col)
-                cell.fill = PatternFill(start_color=fill_color.replace('#', ''),
-                                        end_color=fill_color.replace('#', ''),
-                                        fill_type="solid")
-                cell.font = Font(color="000000")
-    # Freeze header row
-    ws.freeze_panes = ws['A2']
-    # Auto-adjust column widths
-    for col in ws.columns:
-        max_length = 0
-        col_letter = col[0].column_letter
-        for cell in col:
-            try:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            except Exception:
-                pass
-        ws.column_dimensions[col_letter].width = max_length + 2
-    wb.save(output)
+    n_cols = len(df_to_export.columns)
+    with pd.ExcelWriter(output, engine="openpyxl", datetime_format=EXCEL_DATETIME_FORMAT) as writer:
+        df_to_export.to_excel(writer, sheet_name="Inventory Status", index=False)
+        ws = writer.sheets["Inventory Status"]
+        if "Status" in df_to_export.columns:
+            # One PatternFill per status, shared by every cell in that status group
+            font = Font(color="000000")
+            rows_by_status = df_to_export.groupby("Status", observed=True, dropna=False).indices
+            for status, positions in rows_by_status.items():
+                fill_color = get_row_fill_color(status).replace('#', '')
+                fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
+                for pos in positions:
+                    for col in range(1, n_cols + 1):
+                        cell = ws.cell(row=int(pos) + 2, column=col)
+                        cell.fill = fill
+                        cell.font = font
+        # Freeze header row
+        ws.freeze_panes = ws['A2']
+        # Auto-adjust column widths
+        for i, col_name in enumerate(df_to_export.columns, 1):
+            if pd.api.types.is_datetime64_any_dtype(df_to_export[col_name]):
+                # Dates render in the workbook's datetime format, not their str() form
+                max_len = len(EXCEL_DATETIME_FORMAT) if df_to_export[col_name].notna().any() else 0
+            else:
+                max_len = df_to_export[col_name].astype("string").str.len().max()
+            width = max(len(str(col_name)), 0 if pd.isna(max_len) else int(max_len)) + 2
+            ws.column_dimensions[get_column_letter(i)].width = width
     output.seek(0)
     return output
 
-def assess_status(row: pd.Series) -> str:
-    """
-    Assess inventory status based on SOH, Min Qty, and Max Qty.
-    Handles missing or NaN values robustly.
-    """
-    soh = row.get('SOH', np.nan)
-    min_qty = row.get('Min Qty', np.nan)
-    max_qty = row.get('Max Qty', np.nan)
-    if pd.isna(soh):
-        return "❓ Missing SOH"
-    if pd.isna(min_qty) or pd.isna(max_qty):
-        return "❓ Missing SOH"
+def assess_status_vec(df: pd.DataFrame) -> pd.Series:
+    """
+    Assess inventory status based on SOH, Min Qty, and Max Qty for every row.
+    Rows missing any of the three are marked as Missing SOH.
+    Returns a categorical Series of status labels aligned to df's index.
+    """
+    soh = df['SOH'].to_numpy(dtype=np.float64, na_value=np.nan)
+    min_qty = df['Min Qty'].to_numpy(dtype=np.float64, na_value=np.nan)
+    max_qty = df['Max Qty'].to_numpy(dtype=np.float64, na_value=np.nan)
     reorder_threshold = max_qty - ((max_qty - min_qty) / 3)
-    if soh < min_qty:
-        return "🔴 Critical!!! Below Min Qty"
-    elif soh < reorder_threshold:
-        return "🟠 Reorder Level"
-    elif soh > max_qty:
-        return "🕣 Overstocked"
-    else:
-        return "✅ Healthy"
+    conds = [
+        np.isnan(soh) | np.isnan(min_qty) | np.isnan(max_qty),
+        soh < min_qty,
+        soh < reorder_threshold,
+        soh > max_qty,
+    ]
+    choices = [
+        "❓ Missing SOH",
+        "🔴 Critical!!! Below Min Qty",
+        "🟠 Reorder Level",
+        "🕣 Overstocked",
+    ]
+    status = np.select(conds, choices, default="✅ Healthy")
+    return pd.Series(pd.Categorical(status, categories=choices + ["✅ Healthy"]), index=df.index)
 
-def suggest_reorder(row: pd.Series) -> Optional[int]:
-    """
-    Suggest reorder quantity if SOH is below the reorder threshold (i.e., status is 'Reorder Level' or 'Critical!!! Below Min Qty'),
-    rounding up to the nearest Minor Order Multiple. Returns None if no reorder is needed or if required fields are missing.
-    """
-    soh = row.get('SOH', np.nan)
-    min_qty = row.get('Min Qty', np.nan)
-    max_qty = row.get('Max Qty', np.nan)
-    moq = row.get('MOQ', np.nan)
-    minor_mult = row.get('Minor Order Multiple', np.nan)
-    if pd.isna(soh) or pd.isna(min_qty) or pd.isna(max_qty) or pd.isna(moq):
-        return None
+def suggest_reorder_vec(df: pd.DataFrame) -> pd.Series:
+    """
+    Suggest reorder quantity where SOH is below the reorder threshold (i.e., status is 'Reorder Level' or 'Critical!!! Below Min Qty'),
+    rounding up to the nearest Minor Order Multiple.
+    Returns a nullable Int64 Series, <NA> where no reorder is needed or fields are missing.
+    """
+    soh = df['SOH'].to_numpy(dtype=np.float64, na_value=np.nan)
+    min_qty = df['Min Qty'].to_numpy(dtype=np.float64, na_value=np.nan)
+    max_qty = df['Max Qty'].to_numpy(dtype=np.float64, na_value=np.nan)
+    moq = df['MOQ'].to_numpy(dtype=np.float64, na_value=np.nan)
+    minor_mult = df['Minor Order Multiple'].to_numpy(dtype=np.float64, na_value=np.nan)
     reorder_threshold = max_qty - ((max_qty - min_qty) / 3)
-    if soh < reorder_threshold:
-        base = max(moq, min_qty - soh)
-        if not pd.isna(minor_mult) and minor_mult > 0:
-            base = (np.ceil(base / minor_mult)) * minor_mult
-        return int(base)
-    return None
+    valid = ~(np.isnan(soh) | np.isnan(min_qty) | np.isnan(max_qty) | np.isnan(moq))
+    need = valid & (soh < reorder_threshold)
+    base = np.maximum(moq, min_qty - soh)
+    has_mult = minor_mult > 0
+    safe_mult = np.where(has_mult, minor_mult, 1.0)
+    base = np.where(has_mult, np.ceil(base / safe_mult) * safe_mult, base)
+    qty = np.where(need, np.trunc(base), np.nan)
+    return pd.Series(pd.array(qty, dtype="Int64"), index=df.index)
+
+def style_table(df_display: pd.DataFrame) -> "pd.io.formats.style.Styler":
+    """
+    Color every row by its status in a single Styler pass.
+    Builds the full 2-D style grid at once instead of one list per row.
+    """
+    color_map = df_display["Status"].astype(object).map(FILL_COLORS).fillna("#FFFFFF").to_numpy(dtype=object)
+    row_styles = "background-color: " + color_map[:, None] + "; color: black;"
+    styles = pd.DataFrame(
+        np.broadcast_to(row_styles, df_display.shape),
+        index=df_display.index,
+        columns=df_display.columns
+    )
+    return df_display.style.apply(lambda _: styles, axis=None)
+
+def simulate_runout_vec(usage: np.ndarray, soh: np.ndarray) -> np.ndarray:
+    """
+    Simulate inventory runout over an (N, K) forecast usage block, marking '✅' where
+    the remaining SOH covers a period's usage. Walks forecast periods column by column
+    across all rows at once and returns an (N, K) array of '✅' / '' marks.
+    """
+    remaining_soh = np.array(soh, dtype=np.float64)
+    covered = np.zeros(usage.shape, dtype=bool)
+    for j in range(usage.shape[1]):
+        # NaN comparisons are False, so missing usage or SOH is never covered
+        covered[:, j] = remaining_soh >= usage[:, j]
+        remaining_soh = np.where(covered[:, j], remaining_soh - usage[:, j], remaining_soh)
+    return np.where(covered, "✅", "")
 
-def highlight_row(row: pd.Series) -> List[str]:
+def estimate_runout_vec(usage: np.ndarray, soh: np.ndarray) -> np.ndarray:
     """
-    Return a list of style strings for DataFrame row styling in Streamlit.
+    Estimate the forecast period (0-based) in which SOH runs out for every row of
+    an (N, K) forecast usage block. Missing usage counts as zero; NaN if SOH <= 0,
+    is missing, or is never exhausted.
     """
-    status = row.get("Status", "")
-    fill_color = get_row_fill_color(status)
-    return [f"background-color: {fill_color}; color: black;" for _ in row]
+    if usage.shape[1] == 0:
+        return np.full(len(soh), np.nan)
+    cumulative = np.nan_to_num(usage).cumsum(axis=1)
+    runs_out = cumulative >= soh[:, None]
+    any_out = runs_out.any(axis=1)
+    period = np.where(any_out, runs_out.argmax(axis=1).astype(np.float64), np.nan)
+    period[soh <= 0] = np.nan
+    return period
+
+if njit is not None:
+    @njit(parallel=True, cache=True)
+    def _runout_and_cover(usage, soh, out_period, out_mark):
+        # Fused row kernel: greedy coverage marks and cumulative runout period in one pass.
+        # No fastmath, as the v == v NaN checks must survive compilation.
+        n_rows, n_periods = usage.shape
+        for i in prange(n_rows):
+            s = soh[i]
+            remaining = s
+            used = 0.0
+            found = -1
+            for j in range(n_periods):
+                v = usage[i, j]
+                if v == v:
+                    if remaining >= v:
+                        remaining -= v
+                        out_mark[i, j] = True
+                    used += v
+                if found < 0 and used >= s:
+                    found = j
+            if found >= 0 and s > 0:
+                out_period[i] = found
+            else:
+                out_period[i] = np.nan
 
-def simulate_runout(row: pd.Series, forecast_cols: List[str]) -> pd.Series:
-    """
-    Simulate inventory runout over forecast periods, marking '✅' if SOH covers usage.
-    Returns a Series with the same index as forecast_cols.
-    """
-    remaining_soh = row.get("SOH", np.nan)
-    result = []
-    for col in forecast_cols:
-        usage = row.get(col, np.nan)
-        if pd.isna(usage) or pd.isna(remaining_soh):
-            result.append("")
-        elif remaining_soh >= usage:
-            remaining_soh -= usage
-            result.append("✅")
-        else:
-            result.append("")
-    return pd.Series(result, index=forecast_cols)
+def runout_and_coverage(usage: np.ndarray, soh: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the runout period and the '✅' / '' coverage marks for an (N, K) usage block.
+    Uses a fused Numba kernel when numba is installed, otherwise the NumPy helpers.
+    """
+    if njit is None or usage.shape[1] == 0:
+        return estimate_runout_vec(usage, soh), simulate_runout_vec(usage, soh)
+    usage = np.ascontiguousarray(usage)
+    soh = np.ascontiguousarray(soh, dtype=np.float64)
+    out_period = np.empty(usage.shape[0], dtype=np.float64)
+    out_mark = np.zeros(usage.shape, dtype=np.bool_)
+    _runout_and_cover(usage, soh, out_period, out_mark)
+    return out_period, np.where(out_mark, "✅", "")
 
 def highlight_forecast(val: Any) -> str:
     """